@@ -0,0 +1,510 @@
+"""
+Load generator for the cipher site.
+
+Starts the app under gunicorn on a free local port (or targets an existing
+server with --url), replays a weighted mix of `/` and `/solve` requests at one
+or more concurrency levels, and reports throughput, latency percentiles, error
+rates and per-worker CPU / RSS.
+
+Examples:
+    python loadtest.py --workers 2 --concurrency 1,4,8 --duration 30
+    python loadtest.py --mix index:1,caesar:4,substitution:1 --time-limits 1,3
+    python loadtest.py --json run.json --compare baseline.json --max-regression 0.15
+
+Each request re-enciphers its ciphertext under a fresh random letter
+substitution (see `vary_cipher`). part1.segmentWord memoizes every string it
+segments, so replaying the same few ciphertexts would mostly measure cache
+lookups; pass --repeat-ciphers to replay them verbatim.
+
+Only the standard library is used. Worker CPU / RSS is read from /proc, so it
+is reported on Linux and only when this script started the server.
+"""
+import argparse
+import ast
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ERROR_MARKER = b'<pre class="mono">Error: '
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def load_ciphers(path=None):
+    # Read ciphertexts from a file (one per line), or pull the `ciphers` list out
+    # of part1.py without importing it (importing loads all the n-gram tables).
+    if path:
+        with open(path) as f:
+            return [line.strip() for line in f if line.strip()]
+    with open(os.path.join(HERE, "part1.py")) as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "ciphers" for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise SystemExit("No `ciphers` list found in part1.py; pass --cipher-file")
+
+
+def parse_mix(spec):
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition(":")
+        name = name.strip()
+        if name not in ("index", "caesar", "substitution"):
+            raise argparse.ArgumentTypeError(f"unknown mix entry: {name!r}")
+        try:
+            weight = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid weight for {name}: {weight!r}")
+        if not math.isfinite(weight) or weight < 0:
+            raise argparse.ArgumentTypeError(f"weight for {name} must be a finite number >= 0, got {weight}")
+        mix.append((name, weight))
+    if sum(weight for _, weight in mix) <= 0:
+        raise argparse.ArgumentTypeError("mix weights must not all be zero")
+    return mix
+
+
+def positive_int(value):
+    try:
+        value = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}")
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"must be positive, got {value}")
+    return value
+
+
+def non_negative_int(value):
+    try:
+        value = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}")
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must be >= 0, got {value}")
+    return value
+
+
+def positive_float(value):
+    try:
+        value = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number: {value!r}")
+    if not math.isfinite(value) or value <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive number, got {value}")
+    return value
+
+
+def parse_int_list(spec):
+    # Comma separated list of positive ints (concurrency levels, time limits)
+    try:
+        values = [int(x) for x in spec.split(",") if x.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer list: {spec!r}")
+    if not values:
+        raise argparse.ArgumentTypeError("list must not be empty")
+    if any(v <= 0 for v in values):
+        raise argparse.ArgumentTypeError(f"values must be positive, got {spec!r}")
+    return values
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile on an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ---------- Server process ----------
+
+def start_server(workers, port, timeout, log_file):
+    cmd = [
+        sys.executable, "-m", "gunicorn",
+        "-w", str(workers),
+        "-b", f"127.0.0.1:{port}",
+        "--timeout", str(timeout),
+        "app:app",
+    ]
+    # part1.py opens its n-gram files by relative path, so run from this folder.
+    # Gunicorn's error log goes to a file rather than a pipe nobody drains, so a
+    # chatty server can't block on a full pipe buffer mid-run.
+    return subprocess.Popen(cmd, cwd=HERE, stdout=subprocess.DEVNULL, stderr=log_file)
+
+
+def wait_until_ready(base_url, proc, log_file=None, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            err = ""
+            if log_file is not None:
+                log_file.seek(0)
+                err = log_file.read().decode(errors="replace")
+            raise SystemExit(f"Server exited during startup:\n{err}")
+        try:
+            with urllib.request.urlopen(base_url + "/", timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except (urllib.error.URLError, OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.25)
+    raise SystemExit(f"Server at {base_url} not ready after {timeout}s")
+
+
+def stop_server(proc):
+    if proc is None or proc.poll() is not None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def worker_pids(master_pid):
+    # Gunicorn workers are direct children of the master process
+    pids = []
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return pids
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == master_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def parse_stat(text):
+    # Returns (cpu_seconds, rss_bytes) from the contents of /proc/<pid>/stat.
+    # The comm field may contain spaces or parens, so split after the last ')'.
+    fields = text.rsplit(")", 1)[1].split()
+    # Fields after the comm: state=0, ..., utime=11, stime=12, rss=21
+    cpu = (int(fields[11]) + int(fields[12])) / CLK_TCK
+    rss = int(fields[21]) * PAGE_SIZE
+    return cpu, rss
+
+
+def proc_sample(pid):
+    # Returns (cpu_seconds, rss_bytes) for a process, or None if it is gone
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return parse_stat(f.read())
+    except OSError:
+        return None
+
+
+class ResourceSampler(threading.Thread):
+    """Periodically samples CPU time and RSS for each gunicorn worker."""
+
+    def __init__(self, master_pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.first = {}
+        self.last = {}
+        self.peak_rss = {}
+
+    def sample(self):
+        for pid in worker_pids(self.master_pid):
+            s = proc_sample(pid)
+            if s is None:
+                continue
+            self.first.setdefault(pid, s)
+            self.last[pid] = s
+            self.peak_rss[pid] = max(self.peak_rss.get(pid, 0), s[1])
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.sample()
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        self.sample()
+
+    def report(self, wall):
+        rows = []
+        for pid in sorted(self.last):
+            cpu = self.last[pid][0] - self.first[pid][0]
+            rows.append({
+                "pid": pid,
+                "cpu_seconds": round(cpu, 3),
+                "cpu_percent": round(100.0 * cpu / wall, 1) if wall else 0.0,
+                "rss_mb": round(self.last[pid][1] / 2**20, 1),
+                "peak_rss_mb": round(self.peak_rss[pid] / 2**20, 1),
+            })
+        return rows
+
+
+# ---------- Load generation ----------
+
+def vary_cipher(cipher, rng):
+    # Apply a random letter substitution so no two requests send the same text.
+    # A substitution cipher stays a substitution cipher with the same letter
+    # statistics, so solver cost is unchanged; for Caesar requests the 25 shifts
+    # are as unseen as the wrong shifts of a real Caesar cipher, which is where
+    # the brute force spends its time.
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    shuffled = rng.sample(letters, 26)
+    table = str.maketrans(letters + letters.upper(), "".join(shuffled) + "".join(shuffled).upper())
+    return cipher.translate(table)
+
+
+def build_request(kind, ciphers, time_limits, rng, vary=True):
+    if kind == "index":
+        return "GET /", "/", None
+    cipher = rng.choice(ciphers)
+    if vary:
+        cipher = vary_cipher(cipher, rng)
+    form = {"ciphertext": cipher, "method": kind}
+    label = f"POST /solve {kind}"
+    if kind == "substitution":
+        limit = rng.choice(time_limits)
+        form["time_limit"] = str(limit)
+        label += f" t={limit}"
+    return label, "/solve", urllib.parse.urlencode(form).encode()
+
+
+def run_level(base_url, concurrency, duration, max_requests, mix, ciphers,
+              time_limits, request_timeout, seed, vary=True):
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    results = []  # (label, latency_seconds, ok)
+    lock = threading.Lock()
+    issued = [0]
+    deadline = time.time() + duration
+
+    def worker(idx):
+        rng = random.Random(seed + idx)
+        while time.time() < deadline:
+            with lock:
+                if max_requests and issued[0] >= max_requests:
+                    return
+                issued[0] += 1
+            kind = rng.choices(names, weights)[0]
+            label, path, data = build_request(kind, ciphers, time_limits, rng, vary)
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(base_url + path, data=data, timeout=request_timeout) as resp:
+                    body = resp.read()
+                    ok = resp.status == 200 and ERROR_MARKER not in body
+            except (urllib.error.URLError, OSError, http.client.HTTPException):
+                # Truncated or malformed responses count as errors rather than
+                # killing the client thread
+                ok = False
+            latency = time.perf_counter() - started
+            with lock:
+                results.append((label, latency, ok))
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.time() - started
+
+
+def summarize(results, wall):
+    groups = {"all": results}
+    for r in sorted(results, key=lambda r: r[0]):
+        groups.setdefault(r[0], []).append(r)
+    summary = {}
+    for label, rows in groups.items():
+        latencies = sorted(r[1] for r in rows)
+        errors = sum(1 for r in rows if not r[2])
+        summary[label] = {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+            "rps": round(len(rows) / wall, 3) if wall else 0.0,
+            "ok_rps": round((len(rows) - errors) / wall, 3) if wall else 0.0,
+            "p50_ms": _ms(percentile(latencies, 50)),
+            "p90_ms": _ms(percentile(latencies, 90)),
+            "p99_ms": _ms(percentile(latencies, 99)),
+            "max_ms": _ms(latencies[-1] if latencies else None),
+        }
+    return summary
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+# ---------- Reporting ----------
+
+def print_level(level):
+    print(f"\n=== concurrency {level['concurrency']} "
+          f"({level['wall_seconds']:.1f}s wall) ===")
+    header = f"{'endpoint':<34}{'reqs':>7}{'err%':>7}{'rps':>9}{'ok rps':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for label, s in level["endpoints"].items():
+        print(f"{label:<34}{s['requests']:>7}{100 * s['error_rate']:>6.1f}%{s['rps']:>9.2f}{s['ok_rps']:>9.2f}"
+              f"{_fmt(s['p50_ms'])}{_fmt(s['p90_ms'])}{_fmt(s['p99_ms'])}{_fmt(s['max_ms'])}")
+    if level["workers"]:
+        print(f"\n{'worker pid':<12}{'cpu s':>9}{'cpu %':>8}{'rss MB':>9}{'peak MB':>9}")
+        for w in level["workers"]:
+            print(f"{w['pid']:<12}{w['cpu_seconds']:>9.2f}{w['cpu_percent']:>8.1f}"
+                  f"{w['rss_mb']:>9.1f}{w['peak_rss_mb']:>9.1f}")
+
+
+def _fmt(value):
+    return f"{'-':>10}" if value is None else f"{value:>10.1f}"
+
+
+# Report fields that must match for two runs to be comparable
+CONFIG_FIELDS = ("workers", "mix", "time_limits", "duration", "requests", "repeat_ciphers")
+
+
+def compare(report, baseline, max_regression, max_error_increase):
+    # Returns a list of failure messages: the runs were configured differently,
+    # successful throughput at a concurrency level dropped by more than
+    # max_regression, or the error rate rose by more than max_error_increase.
+    mismatched = [k for k in CONFIG_FIELDS if report.get(k) != baseline.get(k)]
+    if mismatched:
+        return [f"baseline {k} {baseline.get(k)!r} differs from this run's {report.get(k)!r}"
+                for k in mismatched]
+
+    base_levels = {lvl["concurrency"]: lvl["endpoints"]["all"] for lvl in baseline["levels"]}
+    failures = []
+    compared = 0
+    for lvl in report["levels"]:
+        c = lvl["concurrency"]
+        if c not in base_levels:
+            failures.append(f"no baseline for concurrency {c}")
+            continue
+        compared += 1
+        current, base = lvl["endpoints"]["all"], base_levels[c]
+        if base["ok_rps"]:
+            change = (current["ok_rps"] - base["ok_rps"]) / base["ok_rps"]
+            print(f"concurrency {c}: {current['ok_rps']:.2f} ok rps vs baseline "
+                  f"{base['ok_rps']:.2f} ({100 * change:+.1f}%)")
+            if change < -max_regression:
+                failures.append(f"throughput regression at concurrency {c} ({100 * change:+.1f}%)")
+        if current["error_rate"] - base["error_rate"] > max_error_increase:
+            failures.append(f"error rate at concurrency {c} rose from "
+                            f"{100 * base['error_rate']:.1f}% to {100 * current['error_rate']:.1f}%")
+    if not compared:
+        failures.append("no concurrency levels in common with the baseline")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the cipher site.")
+    parser.add_argument("--url", help="Target an already running server instead of starting gunicorn")
+    parser.add_argument("--workers", type=positive_int, default=2, help="Gunicorn worker count (default: 2)")
+    parser.add_argument("--concurrency", type=parse_int_list, default=[1, 4, 8],
+                        help="Comma separated client concurrency levels (default: 1,4,8)")
+    parser.add_argument("--duration", type=positive_float, default=20.0, help="Seconds to run each level (default: 20)")
+    parser.add_argument("--requests", type=non_negative_int, default=0, help="Stop a level after this many requests (0 = no cap)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("index:1,caesar:4,substitution:1"),
+                        help="Weighted request mix of index/caesar/substitution (default: index:1,caesar:4,substitution:1)")
+    parser.add_argument("--time-limits", type=parse_int_list, default=[1, 2],
+                        help="Comma separated time_limit values for substitution requests (default: 1,2)")
+    parser.add_argument("--cipher-file", help="File with one ciphertext per line (default: the ciphers in part1.py)")
+    parser.add_argument("--repeat-ciphers", action="store_true",
+                        help="Send ciphertexts verbatim instead of re-enciphering each request (hits the solver's cache)")
+    parser.add_argument("--seed", type=int, default=378, help="Random seed for the request mix")
+    parser.add_argument("--json", dest="json_path", help="Write the full report to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON report to compare throughput against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed fractional throughput drop vs --compare before failing (default: 0.10)")
+    parser.add_argument("--max-error-increase", type=float, default=0.01,
+                        help="Allowed absolute error rate rise vs --compare before failing (default: 0.01)")
+    args = parser.parse_args(argv)
+
+    ciphers = load_ciphers(args.cipher_file)
+    # Allow substitution requests to run to their time limit plus segmentation
+    request_timeout = max(args.time_limits) + 60
+    proc = None
+    log_file = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        log_file = tempfile.TemporaryFile()
+        proc = start_server(args.workers, port, request_timeout, log_file)
+
+    report = {
+        "url": base_url,
+        "workers": None if args.url else args.workers,
+        "mix": dict(args.mix),
+        "time_limits": args.time_limits,
+        "duration": args.duration,
+        "requests": args.requests,
+        "repeat_ciphers": args.repeat_ciphers,
+        "levels": [],
+    }
+    try:
+        wait_until_ready(base_url, proc, log_file)
+        for i, concurrency in enumerate(args.concurrency):
+            sampler = ResourceSampler(proc.pid) if proc is not None else None
+            if sampler:
+                sampler.start()
+            results, wall = run_level(base_url, concurrency, args.duration, args.requests, args.mix,
+                                      ciphers, args.time_limits, request_timeout, args.seed + 1000 * i,
+                                      not args.repeat_ciphers)
+            workers = []
+            if sampler:
+                sampler.stop()
+                workers = sampler.report(wall)
+            level = {
+                "concurrency": concurrency,
+                "wall_seconds": round(wall, 3),
+                "endpoints": summarize(results, wall),
+                "workers": workers,
+            }
+            report["levels"].append(level)
+            print_level(level)
+    finally:
+        stop_server(proc)
+        if log_file is not None:
+            log_file.close()
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote report to {args.json_path}")
+
+    if args.compare:
+        print()
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        failures = compare(report, baseline, args.max_regression, args.max_error_increase)
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        if failures:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
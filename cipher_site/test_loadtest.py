@@ -0,0 +1,266 @@
+import argparse
+import os
+import random
+import socket
+import sys
+import threading
+
+import pytest
+
+import loadtest
+
+
+# ---------- Argument parsing ----------
+
+def test_parse_mix_weights():
+    assert loadtest.parse_mix("index:1,caesar:4,substitution") == [
+        ("index", 1.0), ("caesar", 4.0), ("substitution", 1.0)]
+    assert loadtest.parse_mix("index:0,caesar:2") == [("index", 0.0), ("caesar", 2.0)]
+
+
+@pytest.mark.parametrize("spec", [
+    "index:0,caesar:0",
+    "caesar:-1,index:2",
+    "caesar:abc",
+    "caesar:nan",
+    "caesar:inf",
+    "rot13:1",
+])
+def test_parse_mix_rejects_bad_specs(spec):
+    with pytest.raises(argparse.ArgumentTypeError):
+        loadtest.parse_mix(spec)
+
+
+def test_parse_int_list():
+    assert loadtest.parse_int_list("1,4, 8") == [1, 4, 8]
+
+
+@pytest.mark.parametrize("spec", ["", ",", "0", "1,-2", "1,x"])
+def test_parse_int_list_rejects_bad_specs(spec):
+    with pytest.raises(argparse.ArgumentTypeError):
+        loadtest.parse_int_list(spec)
+
+
+@pytest.mark.parametrize("args", [
+    ["--workers", "0"],
+    ["--workers", "-1"],
+    ["--duration", "0"],
+    ["--duration", "nan"],
+    ["--requests", "-1"],
+])
+def test_main_rejects_bad_scalars(args):
+    with pytest.raises(SystemExit) as exc:
+        loadtest.main(args)
+    assert exc.value.code == 2
+
+
+def test_main_rejects_empty_time_limits():
+    with pytest.raises(SystemExit) as exc:
+        loadtest.main(["--time-limits", ""])
+    assert exc.value.code == 2
+
+
+# ---------- Request generation ----------
+
+def test_vary_cipher_keeps_letter_structure():
+    cipher = "HTEBG RMAJH TMBUP pmhtj"
+    varied = loadtest.vary_cipher(cipher, random.Random(1))
+    assert varied != cipher
+    assert [c.isalpha() for c in varied] == [c.isalpha() for c in cipher]
+    assert [c.isupper() for c in varied] == [c.isupper() for c in cipher]
+    # Same letters map to same letters, different letters stay different
+    pairs = set(zip(cipher.lower(), varied.lower()))
+    assert len(pairs) == len(set(cipher.lower()))
+
+
+def test_build_request_varies_ciphertext_unless_repeated():
+    rng = random.Random(2)
+    bodies = {loadtest.build_request("caesar", ["abcdef"], [1], rng)[2] for _ in range(20)}
+    assert len(bodies) == 20
+    _, _, body = loadtest.build_request("caesar", ["abcdef"], [1], rng, vary=False)
+    assert b"ciphertext=abcdef" in body
+
+
+def truncating_server():
+    # Promises a 100 byte body, sends 5 and hangs up
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+
+    def serve():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with conn:
+                conn.recv(65536)
+                conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\nshort")
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server
+
+
+def test_run_level_counts_truncated_responses_as_errors():
+    server = truncating_server()
+    try:
+        url = f"http://127.0.0.1:{server.getsockname()[1]}"
+        results, wall = loadtest.run_level(url, 2, 0.3, 0, [("caesar", 1.0)], ["abc"], [1], 5, 0)
+    finally:
+        server.close()
+    assert wall >= 0.3
+    assert results
+    assert not any(ok for _, _, ok in results)
+
+
+# ---------- Stats ----------
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert loadtest.percentile(values, 50) == 50
+    assert loadtest.percentile(values, 99) == 99
+    assert loadtest.percentile(values, 100) == 100
+    assert loadtest.percentile([1, 2], 50) == 1
+    assert loadtest.percentile([7], 0) == 7
+    assert loadtest.percentile([], 50) is None
+
+
+def test_summarize_counts_errors_separately():
+    results = [
+        ("GET /", 0.010, True),
+        ("GET /", 0.030, True),
+        ("POST /solve caesar", 0.100, True),
+        ("POST /solve caesar", 0.001, False),
+    ]
+    summary = loadtest.summarize(results, wall=2.0)
+
+    overall = summary["all"]
+    assert overall["requests"] == 4
+    assert overall["errors"] == 1
+    assert overall["error_rate"] == 0.25
+    assert overall["rps"] == 2.0
+    assert overall["ok_rps"] == 1.5
+    assert overall["max_ms"] == 100.0
+
+    caesar = summary["POST /solve caesar"]
+    assert caesar["ok_rps"] == 0.5
+    assert caesar["p50_ms"] == 1.0
+    assert summary["GET /"]["p50_ms"] == 10.0
+    assert list(summary) == ["all", "GET /", "POST /solve caesar"]
+
+
+# ---------- Baseline comparison ----------
+
+def make_report(levels, **config):
+    report = {
+        "workers": 2,
+        "mix": {"index": 1.0, "caesar": 4.0, "substitution": 1.0},
+        "time_limits": [1, 2],
+        "duration": 20.0,
+        "requests": 0,
+        "repeat_ciphers": False,
+        "levels": [],
+    }
+    report.update(config)
+    for concurrency, requests, errors in levels:
+        results = [("POST /solve caesar", 0.01, i >= errors) for i in range(requests)]
+        report["levels"].append({
+            "concurrency": concurrency,
+            "endpoints": loadtest.summarize(results, wall=10.0),
+        })
+    return report
+
+
+def test_compare_passes_within_tolerance():
+    baseline = make_report([(1, 100, 0), (4, 300, 0)])
+    current = make_report([(1, 95, 0), (4, 310, 0)])
+    assert loadtest.compare(current, baseline, 0.10, 0.01) == []
+
+
+def test_compare_flags_throughput_drop():
+    baseline = make_report([(1, 100, 0), (4, 300, 0)])
+    current = make_report([(1, 100, 0), (4, 200, 0)])
+    failures = loadtest.compare(current, baseline, 0.10, 0.01)
+    assert len(failures) == 1
+    assert "concurrency 4" in failures[0]
+
+
+def test_compare_flags_fast_errors():
+    # A broken solver renders Error pages quickly, so raw throughput goes up
+    baseline = make_report([(4, 300, 0)])
+    current = make_report([(4, 400, 200)])
+    assert current["levels"][0]["endpoints"]["all"]["rps"] > baseline["levels"][0]["endpoints"]["all"]["rps"]
+    failures = loadtest.compare(current, baseline, 0.10, 0.01)
+    assert any("throughput regression" in f for f in failures)
+    assert any("error rate" in f for f in failures)
+
+
+def test_compare_flags_error_rate_rise_alone():
+    baseline = make_report([(1, 1000, 0)])
+    current = make_report([(1, 1050, 50)])
+    failures = loadtest.compare(current, baseline, 0.10, 0.01)
+    assert failures == ["error rate at concurrency 1 rose from 0.0% to 4.8%"]
+
+
+@pytest.mark.parametrize("field, value", [
+    ("mix", {"caesar": 1.0}),
+    ("time_limits", [5]),
+    ("workers", 4),
+    ("duration", 60.0),
+    ("requests", 500),
+    ("repeat_ciphers", True),
+])
+def test_compare_refuses_mismatched_config(field, value):
+    baseline = make_report([(1, 100, 0)])
+    current = make_report([(1, 100, 0)], **{field: value})
+    failures = loadtest.compare(current, baseline, 0.10, 0.01)
+    assert len(failures) == 1
+    assert field in failures[0]
+
+
+def test_compare_flags_level_missing_from_baseline():
+    baseline = make_report([(1, 100, 0), (4, 300, 0)])
+    current = make_report([(1, 100, 0), (8, 300, 0)])
+    assert loadtest.compare(current, baseline, 0.10, 0.01) == ["no baseline for concurrency 8"]
+
+
+@pytest.mark.parametrize("base_levels", [[(1, 100, 0), (4, 300, 0), (8, 400, 0)], []])
+def test_compare_fails_without_overlapping_levels(base_levels):
+    baseline = make_report(base_levels)
+    current = make_report([(2, 200, 0)])
+    failures = loadtest.compare(current, baseline, 0.10, 0.01)
+    assert "no concurrency levels in common with the baseline" in failures
+
+
+# ---------- /proc parsing ----------
+
+def test_parse_stat_field_offsets():
+    # pid (comm) state ppid pgrp session tty tpgid flags minflt cminflt majflt
+    # cmajflt utime stime cutime cstime priority nice threads itreal starttime vsize rss
+    text = "1234 (gunicorn: worker [app) x]) S 1 2 3 4 5 6 7 8 9 10 250 50 0 0 20 0 1 0 99 12345 300"
+    cpu, rss = loadtest.parse_stat(text)
+    assert cpu == pytest.approx(300 / loadtest.CLK_TCK)
+    assert rss == 300 * loadtest.PAGE_SIZE
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="needs /proc")
+def test_proc_sample_matches_own_rss():
+    import resource
+
+    cpu, rss = loadtest.proc_sample(os.getpid())
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    assert cpu > 0
+    assert 0 < rss <= peak * 1.01 + loadtest.PAGE_SIZE
+    assert loadtest.proc_sample(2**22 + 1) is None
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="needs /proc")
+def test_worker_pids_finds_children():
+    import subprocess
+
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+    try:
+        assert child.pid in loadtest.worker_pids(os.getpid())
+    finally:
+        child.kill()
+        child.wait()